@@ -10,8 +10,8 @@ from .fuse import (
 )
 
 
-def main():
-    """Main CLI entry point."""
+def build_parser():
+    """Build the stackedfs argument parser."""
     parser = argparse.ArgumentParser(
         prog='stackedfs',
         description='StackedDiffFS (StackedFS) - A horizontal, merge-safe filesystem for AI agents'
@@ -55,8 +55,11 @@ def main():
     direnv_parser.add_argument('--repo', '-r', default='.', help='Repository path')
     direnv_parser.add_argument('--agent', '-a', default=None, help='Agent name')
     
-    args = parser.parse_args()
-    
+    return parser
+
+
+def dispatch(args, parser):
+    """Execute one parsed command in-process."""
     if args.command == 'init':
         init_repo(args.path)
     
@@ -84,5 +87,17 @@ def main():
         sys.exit(1)
 
 
+def main(argv=None):
+    """Main CLI entry point.
+
+    Everything dispatches in-process — no re-exec per subcommand — and
+    callers that drive several commands from one interpreter (tests,
+    shell hooks) can parse once and call dispatch() directly, paying the
+    interpreter/import startup a single time.
+    """
+    parser = build_parser()
+    dispatch(parser.parse_args(argv), parser)
+
+
 if __name__ == '__main__':
     main()
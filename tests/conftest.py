@@ -3,6 +3,8 @@
 import pytest
 import trio
 
+from stackedfs.fuse import StackedFS
+
 
 @pytest.fixture
 def temp_repo(tmp_path):
@@ -22,6 +24,16 @@ def temp_repo(tmp_path):
     return repo_path
 
 
+@pytest.fixture
+def stacked_fs(temp_repo):
+    """Create a StackedFS instance over an empty temporary repository.
+
+    Use this instead of repeating the mkdir/StackedFS boilerplate when a
+    test does not need a custom layer layout before construction.
+    """
+    return StackedFS(str(temp_repo))
+
+
 @pytest.fixture
 def event_loop():
     """Create a trio event loop for async tests."""
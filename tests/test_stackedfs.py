@@ -34,33 +34,22 @@ class TestStackedFSRepository:
             assert agents_path.exists()
             assert work_path.exists()
 
-    def test_load_agents_empty(self):
+    def test_load_agents_empty(self, stacked_fs):
         """Test loading agents from empty repo."""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            repo_path = Path(tmpdir) / "test_repo"
-            repo_path.mkdir()
-            
-            fs = StackedFS(str(repo_path))
-            agents = fs.agents
-            assert agents == []
+        assert stacked_fs.agents == []
 
-    def test_save_agents(self):
+    def test_save_agents(self, temp_repo, stacked_fs):
         """Test saving agents to agents.json."""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            repo_path = Path(tmpdir) / "test_repo"
-            repo_path.mkdir()
-            
-            fs = StackedFS(str(repo_path))
-            fs.agents = ["agent1", "agent2"]
-            fs._save_agents()
-            
-            agents_file = repo_path / "agents.json"
-            assert agents_file.exists()
-            
-            with open(agents_file) as f:
-                data = json.load(f)
-            
-            assert data["agents"] == ["agent1", "agent2"]
+        stacked_fs.agents = ["agent1", "agent2"]
+        stacked_fs._save_agents()
+        
+        agents_file = temp_repo / "agents.json"
+        assert agents_file.exists()
+        
+        with open(agents_file) as f:
+            data = json.load(f)
+        
+        assert data["agents"] == ["agent1", "agent2"]
 
     def test_add_agent(self):
         """Test adding an agent to the repository."""
@@ -95,19 +84,11 @@ class TestStackedFSRepository:
 class TestStackedFSResolving:
     """Tests for path resolution in overlay filesystem."""
 
-    def test_resolve_empty(self):
+    def test_resolve_empty(self, stacked_fs):
         """Test resolving path in empty filesystem."""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            repo_path = Path(tmpdir) / "test_repo"
-            repo_path.mkdir()
-            base_path = repo_path / "base"
-            base_path.mkdir()
-            
-            fs = StackedFS(str(repo_path))
-            
-            path, agent = fs._get_resolved_path("/nonexistent")
-            assert path is None
-            assert agent is None
+        path, agent = stacked_fs._get_resolved_path("/nonexistent")
+        assert path is None
+        assert agent is None
 
     def test_resolve_from_base(self):
         """Test resolving path from base layer."""
@@ -276,6 +257,57 @@ class TestStackedFSHashing:
             conflict = fs._check_conflict("/test.txt")
             assert conflict is True
 
+    def test_meta_db_serves_digest_across_instances(self, temp_repo, monkeypatch):
+        """Test that a remount reads digests from meta.db without re-hashing."""
+        test_file = temp_repo / "base" / "test.txt"
+        test_file.write_text("persisted content")
+        
+        fs1 = StackedFS(str(temp_repo))
+        digest = fs1._compute_hash(str(test_file))
+        assert digest is not None
+        fs1._meta_flush()
+        
+        fs2 = StackedFS(str(temp_repo))
+        monkeypatch.setattr(
+            "stackedfs.fuse._digest_file",
+            lambda path: pytest.fail("digest recomputed despite meta.db row"))
+        assert fs2._compute_hash(str(test_file)) == digest
+
+    def test_meta_db_corrupt_falls_back_to_hashing(self, temp_repo):
+        """Test that a corrupt meta.db degrades to in-memory operation."""
+        (temp_repo / "meta.db").write_bytes(b"this is not a sqlite database")
+        test_file = temp_repo / "base" / "test.txt"
+        test_file.write_text("content")
+        
+        fs = StackedFS(str(temp_repo))
+        assert fs._meta is None
+        
+        digest = fs._compute_hash(str(test_file))
+        assert digest is not None
+        assert fs._compute_hash(str(test_file)) == digest
+
+    def test_check_all_conflicts_reports_divergence(self, temp_repo):
+        """Test that a full rescan reports only divergent agent copies."""
+        (temp_repo / "base" / "changed.txt").write_text("original")
+        (temp_repo / "base" / "same.txt").write_text("shared")
+        
+        agent_dir = temp_repo / "agents" / "agent1"
+        agent_dir.mkdir()
+        (agent_dir / "changed.txt").write_text("modified")
+        (agent_dir / "same.txt").write_text("shared")
+        
+        fs = StackedFS(str(temp_repo))
+        fs.agents = ["agent1"]
+        
+        conflicts = fs.check_all_conflicts()
+        assert len(conflicts) == 1
+        assert conflicts[0]["path"] == "/changed.txt"
+        assert conflicts[0]["agent"] == "agent1"
+
+    def test_check_all_conflicts_empty(self, stacked_fs):
+        """Test that a repository with no agent layers reports nothing."""
+        assert stacked_fs.check_all_conflicts() == []
+
 
 class TestStackedFSOperations:
     """Tests for FUSE operations."""
@@ -494,9 +526,12 @@ class TestStackedFSOperations:
             fi = await fs.open(inode, os.O_WRONLY)
             await fs.write(fi.fh, 0, b"modified")
             await fs.release(fi.fh)
-            
-            # pyfuse3 writes through the file handle, so base file is modified
-            assert test_file.read_text() == "modified"
+
+            # First write copies the file up into the agent layer; the base
+            # layer is left untouched
+            agent_file = repo_path / "agents" / "test-agent" / "test.txt"
+            assert agent_file.read_text() == "modified"
+            assert test_file.read_text() == "original"
 
     @pytest.mark.asyncio
     async def test_write_with_offset(self):
@@ -519,9 +554,12 @@ class TestStackedFSOperations:
             fi = await fs.open(inode, os.O_WRONLY)
             await fs.write(fi.fh, 0, b"X")
             await fs.release(fi.fh)
-            
-            # pyfuse3 writes through the file handle
-            assert test_file.read_text().startswith("X")
+
+            # The write lands in the agent copy, which keeps the unmodified
+            # tail of the base file
+            agent_file = repo_path / "agents" / "test-agent" / "test.txt"
+            assert agent_file.read_text() == "Xello world"
+            assert test_file.read_text() == "hello world"
 
     @pytest.mark.asyncio
     async def test_create_file(self):